@@ -1,4 +1,5 @@
 import json
+from unittest import mock
 
 from django.contrib.auth.models import AnonymousUser, User
 from django.test import TestCase, Client
@@ -77,6 +78,8 @@ class WordTransformTest(TestCase):
             '["aaa"]',                  # valid JSON, but not a JSON string
             '',                         # invalid JSON
             '"sdfwe wer',               # invalid JSON
+            '"foo" "bar"',              # invalid JSON, two strings
+            '"foo\nbar"',               # invalid JSON, unescaped control character
             'abcde' * 10000,            # long invalid JSON
             '"aa"'.encode('utf-8'),     # bytes
             b'\x00\x01',                # bytes
@@ -87,9 +90,28 @@ class WordTransformTest(TestCase):
         for invalid_input in invalid_inputs:
             self.assertRaises(Exception, transform.transform_words, invalid_input)
 
+    def test_state_machine_agrees(self):
+        inputs = [
+            '', ' ', '   ', 'a', 'b', 'ab', 'ba', 'bab', 'aab', 'baa', 'fooma barbu hello',
+            '  aa bb  cc  ', 'I\'d rather die here.', 'vuoirkage mäölnö', 'VUOIRKAGE MÄÖLNÖ',
+            'fooma bar\nbu hello', '\t', '\u212bb b\u212b', 'abcde' * 100,
+        ]
+        for input_string in inputs:
+            expected_output = ''.join(transform.transform_tokens(transform.WordParser(input_string).generate_tokens()))
+            self.assertEqual(expected_output, ''.join(transform.transform_decoded_string(input_string)))
+            self.assertEqual(expected_output, transform.WORD_PAIR_RE.sub(transform.swap_word_pair, input_string))
+
+    def test_generator_chunks(self):
+        chunks = list(transform.transform_words_generator(json.dumps('fooma barbu ' * 1000)))
+        self.assertEqual('bama foorbu ' * 1000, ''.join(chunks))
+        self.assertEqual(2, len(chunks))
+        self.assertGreaterEqual(len(chunks[0]), transform.OUTPUT_CHUNK_SIZE)
+
     def _run_transforms(self, inputs_and_outputs):
         for json_string, expected_output in inputs_and_outputs:
             self.assertEqual(expected_output, transform.transform_words(json_string))
+            with mock.patch.object(transform, 'USE_STATE_MACHINE', True):
+                self.assertEqual(expected_output, transform.transform_words(json_string))
 
 
 class WordTransformHttpTest(TestCase):
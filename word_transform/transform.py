@@ -1,7 +1,6 @@
-import collections
-from enum import Enum
-from io import StringIO
 import json
+from json.decoder import scanstring
+import re
 
 '''
 Coding exercise for KuVa DPS. See description in transform_words().
@@ -11,10 +10,12 @@ Design considerations:
 * At the first glance, the assignment could have been done with some kind of nested loop.
   This would result in highly unmaintainable code.
 * A state machine is a much better fit for the problem.
-* I also considered using regular expressions, but decided against it.
-  In another context, I might have used RE's, but the purpose of the
-  coding exercise is to produce readable and maintainable code.
-  Regular expressions would make the code shorter, but harder to maintain.
+* I also considered using regular expressions, but initially decided against it.
+  Regular expressions make the code shorter, but harder to maintain.
+* However, running the state machine one character at a time in Python is slow, while
+  the re module scans the input in C. The word pairs are therefore found with WORD_PAIR_RE, and
+  the state machine (WordParser) is kept as the readable reference implementation.
+  Set USE_STATE_MACHINE to use the state machine instead, for example when debugging.
 
 Naming considerations:
 * I considered using "tokenizer" or "lexer" but ended up with WordParser.
@@ -62,6 +63,16 @@ __all__ = ['transform_words',
 VOWEL_CHARS = set('aeiouyåäö')
 SPACE_CHARS = ' '
 
+# Use WordParser instead of WORD_PAIR_RE to split the input into words
+USE_STATE_MACHINE = False
+
+# Minimum length (in characters) of the chunks returned by transform_words_generator, so that
+# a streaming response is not written a few characters at a time
+OUTPUT_CHUNK_SIZE = 8192
+
+# json.dumps creates a new encoder on every call when called with non-default arguments
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
 
 class WordTransformException(Exception):
     pass
@@ -74,177 +85,162 @@ class WordTransformLogicError(Exception):
     pass
 
 
-class TokenType(Enum):
-    SPACE = 1
-    WORD_FIRST_PART = 2
-    WORD_SECOND_PART = 3
-
-
-Token = collections.namedtuple('Token', ['token_type', 'string_value'])
-
-
-class CharacterType(Enum):
-    SPACE = 1
-    VOWEL = 2
-    CONSONANT = 3
-    EOF = 4
+# Token types. Tokens are plain two-element tuples (token_type, string_value), which are
+# cheaper to create than namedtuples.
+TOKEN_SPACE = 1
+TOKEN_WORD_FIRST_PART = 2
+TOKEN_WORD_SECOND_PART = 3
+
+# Character classes, used as column index in TRANSITIONS
+CHAR_SPACE = 0
+CHAR_VOWEL = 1
+CHAR_CONSONANT = 2
+
+# Any character not found in CHAR_CLASS is a consonant. Vowels are matched case-insensitively,
+# so uppercase vowels are included, as is ANGSTROM SIGN which lowercases to 'å'.
+CHAR_CLASS = {char: CHAR_SPACE for char in SPACE_CHARS}
+CHAR_CLASS.update({char: CHAR_VOWEL for char in VOWEL_CHARS})
+CHAR_CLASS.update({char.upper(): CHAR_VOWEL for char in VOWEL_CHARS})
+CHAR_CLASS['\u212b'] = CHAR_VOWEL
+
+# Parser states, used as row index in TRANSITIONS
+STATE_INIT = 0
+STATE_READ_SPACE = 1
+STATE_READ_WORD_FIRST_PART = 2
+STATE_READ_VOWELS = 3
+STATE_READ_WORD_SECOND_PART = 4
+
+# Type of the token that is being constructed in each state
+STATE_TOKEN_TYPES = (
+    TOKEN_SPACE,  # STATE_INIT: if no input, treat it as a zero-length space
+    TOKEN_SPACE,
+    TOKEN_WORD_FIRST_PART,
+    TOKEN_WORD_FIRST_PART,
+    TOKEN_WORD_SECOND_PART,
+)
+
+# Actions associated with a transition
+ACTION_CONSUME = 0  # the current character is part of the current token
+ACTION_FINISH = 1  # finish the current token, then start a new token with the current character
+
+
+def build_transitions():
+    '''
+    Build the transition table of the state machine.
 
+    Every character of the input is consumed by exactly one transition, so the parser
+    never needs to look at the same character twice. End of input is not a transition:
+    it always finishes the current token.
 
-'''
-class ParserState(Enum):
-    INIT = 1
-    READ_SPACE = 2
-    READ_WORD_FIRST_PART = 3
-    READ_WORD_SECOND_PART = 4
-    END_OF_INPUT = 5
-'''
+    :return: list indexed by state, containing lists indexed by character class.
+    Each item is a two-element tuple (next_state, action).
+    '''
+    transitions = [None] * len(STATE_TOKEN_TYPES)
 
+    # The initial state only selects the state based on the first character in string
+    transitions[STATE_INIT] = [
+        (STATE_READ_SPACE, ACTION_CONSUME),
+        (STATE_READ_VOWELS, ACTION_CONSUME),
+        (STATE_READ_WORD_FIRST_PART, ACTION_CONSUME),
+    ]
 
-def get_character_type(char):
-    if char is EOF:
-        return CharacterType.EOF
-    assert (isinstance(char, str) and len(char) == 1)
-    if char in SPACE_CHARS:
-        return CharacterType.SPACE
-    elif char.lower() in VOWEL_CHARS:
-        return CharacterType.VOWEL
-    else:
-        return CharacterType.CONSONANT
+    # Consecutive spaces
+    transitions[STATE_READ_SPACE] = [
+        (STATE_READ_SPACE, ACTION_CONSUME),
+        (STATE_READ_VOWELS, ACTION_FINISH),
+        (STATE_READ_WORD_FIRST_PART, ACTION_FINISH),
+    ]
 
+    # Start reading from start of the word
+    transitions[STATE_READ_WORD_FIRST_PART] = [
+        (STATE_READ_SPACE, ACTION_FINISH),
+        (STATE_READ_VOWELS, ACTION_CONSUME),
+        (STATE_READ_WORD_FIRST_PART, ACTION_CONSUME),
+    ]
 
-EOF = object()  # sentinel - marker of end of input in state machine
+    # Read consecutive vowels
+    transitions[STATE_READ_VOWELS] = [
+        (STATE_READ_SPACE, ACTION_FINISH),
+        (STATE_READ_VOWELS, ACTION_CONSUME),
+        (STATE_READ_WORD_SECOND_PART, ACTION_FINISH),
+    ]
 
-Transition = collections.namedtuple('Transition', ['next_state', 'callback'])
+    # Read the rest of the word. Word is terminated by space or end of input.
+    transitions[STATE_READ_WORD_SECOND_PART] = [
+        (STATE_READ_SPACE, ACTION_FINISH),
+        (STATE_READ_WORD_SECOND_PART, ACTION_CONSUME),
+        (STATE_READ_WORD_SECOND_PART, ACTION_CONSUME),
+    ]
 
+    return transitions
 
-class ParserState:
-    def __init__(self, token_type, is_end_state=False):
-        self.token_type = token_type
-        self.transitions = {}
-        self.is_end_state = is_end_state
 
-    def __str__(self):
-        return f'ParserState {self.token_type}'
+TRANSITIONS = build_transitions()
 
-    def __repr__(self):
-        return str(self)
 
-    def process_state(self, current_char):
-        '''
-        Processing a state consists of these steps:
-         * Determining the next state to transition to, based on input character
-         * Executing a callback. The callback may
+class WordParser:
+    def __init__(self, input_string):
+        self.input_string = input_string
 
-        :param current_char:
-        :return: Two-element tuple, where
-        * The first element is the next state the state machine should transition to
-        * The second element is either None or a newly parsed complete Token
-        '''
-        transition = self.transitions[get_character_type(current_char)]
-        return transition.next_state, transition.callback()
+    def generate_tokens(self):
+        # bind to locals, as this is the innermost loop of the algorithm
+        input_string = self.input_string
+        char_class = CHAR_CLASS.get
+        transitions = TRANSITIONS
+        state = STATE_INIT
+        token_start_idx = 0  # tokens are slices of the input string, starting from this index
 
-    def add_transition(self, char_type, callback, next_state):
-        '''
-        Define a state transition.
+        for char_idx, char in enumerate(input_string):
+            next_state, action = transitions[state][char_class(char, CHAR_CONSONANT)]
+            if action == ACTION_FINISH:
+                yield STATE_TOKEN_TYPES[state], input_string[token_start_idx:char_idx]
+                token_start_idx = char_idx
+            state = next_state
 
-        :param char_type: Type of character that triggers this transition
-        :param callback: Action associated with this state (for example, do something with the current character and
-        advance to the next characer)
-        :param next_state: Next state of the state machine
-        :return: None
-        '''
-        if callback is None:
-            callback = lambda: None  # by default, no action
-        self.transitions[char_type] = Transition(next_state, callback)
+        # end of input always finishes the current token
+        yield STATE_TOKEN_TYPES[state], input_string[token_start_idx:]
 
 
-class WordParser:
-    def __init__(self, input_string):
-        self.input_string = input_string
-        self.current_char_idx = 0  # current position of the parser in the input_string
-        self.current_state = self.initialize_state_machine()
-        self.current_token_buffer = StringIO()  # the content of token currently being constructed
-
-    def initialize_state_machine(self):
-        '''
-        Initialize the states and state transitions of the state machine.
-        :return: initial state
-        '''
-        init = ParserState(TokenType.SPACE)  # if no input, treat it as a zero-length space
-        read_space = ParserState(TokenType.SPACE)
-        read_word_first_part = ParserState(TokenType.WORD_FIRST_PART)
-        read_vowels = ParserState(TokenType.WORD_FIRST_PART)
-        read_word_second_part = ParserState(TokenType.WORD_SECOND_PART)
-        end_of_input = ParserState(None, is_end_state=True)  # no token generated
-
-        # Processing the initial state does not consume any characters, just select the next state
-        # based on the first character in string
-        init.add_transition(CharacterType.SPACE, None, read_space)
-        init.add_transition(CharacterType.VOWEL, None, read_word_first_part)
-        init.add_transition(CharacterType.CONSONANT, None, read_word_first_part)
-        init.add_transition(CharacterType.EOF, self.finish_token, end_of_input)
-
-        # Start reading from start of the word
-        read_word_first_part.add_transition(CharacterType.SPACE, self.finish_token, read_space)
-        read_word_first_part.add_transition(CharacterType.VOWEL, self.consume_char, read_vowels)
-        read_word_first_part.add_transition(CharacterType.CONSONANT, self.consume_char, read_word_first_part)
-        read_word_first_part.add_transition(CharacterType.EOF, self.finish_token, end_of_input)
-
-        # Read consecutive vowels
-        read_vowels.add_transition(CharacterType.SPACE, self.finish_token, read_space)
-        read_vowels.add_transition(CharacterType.VOWEL, self.consume_char, read_vowels)
-        read_vowels.add_transition(CharacterType.CONSONANT, self.finish_token, read_word_second_part)
-        read_vowels.add_transition(CharacterType.EOF, self.finish_token, end_of_input)
-
-        # Read the rest of the word. Word is terminated by space or EOF.
-        read_word_second_part.add_transition(CharacterType.SPACE, self.finish_token, read_space)
-        read_word_second_part.add_transition(CharacterType.VOWEL, self.consume_char, read_word_second_part)
-        read_word_second_part.add_transition(CharacterType.CONSONANT, self.consume_char, read_word_second_part)
-        read_word_second_part.add_transition(CharacterType.EOF, self.finish_token, end_of_input)
-
-        # Consecutive spaces
-        read_space.add_transition(CharacterType.SPACE, self.consume_char, read_space)
-        read_space.add_transition(CharacterType.VOWEL, self.finish_token, read_word_first_part)
-        read_space.add_transition(CharacterType.CONSONANT, self.finish_token, read_word_first_part)
-        read_space.add_transition(CharacterType.EOF, self.finish_token, end_of_input)
-
-        return init
+def char_class_pattern(char_class):
+    '''
+    :return: the characters of the given character class, escaped for a regular expression character set
+    '''
+    return re.escape(''.join(sorted(char for char, cls in CHAR_CLASS.items() if cls == char_class)))
 
-    def generate_tokens(self):
 
-        self.current_state = self.initialize_state_machine()
+def build_word_pair_re():
+    '''
+    Build a regular expression that matches either a pair of words or an odd word at the end of the input.
 
-        while not self.current_state.is_end_state:
-            prev_state = self.current_state
-            prev_idx = self.current_char_idx
-            self.current_state, finished_token = self.current_state.process_state(self.current_char)
-            if finished_token:
-                yield finished_token
+    A word is split into the first part (up to and including the first vowels, or the whole word if it
+    has no vowels) and the possibly empty second part, like in WordParser.
+    Groups: 1, 2: first word; 3: space; 4, 5: second word; 6: odd word.
 
-            if self.current_state is prev_state and prev_idx == self.current_char_idx:
-                raise WordTransformLogicError(f'State machine is stuck at {self.current_state} '
-                                              f'char_idx={prev_idx}({self.current_char})')
+    The first word is matched in a lookahead and then repeated with backreferences: a lookahead does
+    not backtrack, so an odd word at the end is not scanned again for every possible split.
+    '''
+    spaces = char_class_pattern(CHAR_SPACE)
+    vowels = char_class_pattern(CHAR_VOWEL)
+    first_part = f'[^{spaces}{vowels}]*[{vowels}]+|[^{spaces}{vowels}]+'
+    second_part = f'[^{spaces}]*'
+    return re.compile(f'(?=({first_part})({second_part}))\\1\\2'
+                      f'([{spaces}]+)'
+                      f'({first_part})({second_part})'
+                      f'|([^{spaces}]+)')
 
-    @property
-    def current_char(self):
-        if self.current_char_idx >= len(self.input_string):
-            return EOF
-        return self.input_string[self.current_char_idx]
 
-    def next_char(self):
-        if self.current_char_idx >= len(self.input_string):
-            raise WordTransformLogicError('Internal error - calling next_char when already at end of input')
-        self.current_char_idx += 1
-        return self.current_char
+WORD_PAIR_RE = build_word_pair_re()
 
-    def consume_char(self):
-        self.current_token_buffer.write(self.current_char)
-        self.next_char()
 
-    def finish_token(self):
-        token = Token(self.current_state.token_type, self.current_token_buffer.getvalue())
-        self.current_token_buffer = StringIO()  # creating new StringIO is faster than truncating
-        return token
+def swap_word_pair(match):
+    '''
+    :param match: match of WORD_PAIR_RE
+    :return: the matched pair of words with the beginnings swapped, or the odd word as is
+    '''
+    first_part_1, second_part_1, space, first_part_2, second_part_2, odd_word = match.groups()
+    if odd_word is not None:
+        return odd_word
+    return first_part_2 + second_part_1 + space + first_part_1 + second_part_2
 
 
 def transform_words(json_string):
@@ -282,20 +278,39 @@ def transform_words(json_string):
     :return: The returned value is a quoted string that pertain to JSON formatting
     '''
 
-    return json.dumps(''.join(transform_words_generator(json_string)), ensure_ascii=False)
+    decoded_input = decode_json_string(json_string)
+    if USE_STATE_MACHINE:
+        output = ''.join(generate_fragments(decoded_input))
+    elif ' ' not in decoded_input.strip(' '):
+        # fast path: fewer than two words, so there is nothing to swap
+        output = decoded_input
+    else:
+        output = WORD_PAIR_RE.sub(swap_word_pair, decoded_input)
+    return JSON_ENCODER.encode(output)
 
 
 def transform_words_generator(json_string):
     '''
-    Like transform_words, but a generator that returns the output fragments as it is constructed
+    Like transform_words, but a generator that returns the output in chunks as it is constructed.
+    Each chunk except the last one is at least OUTPUT_CHUNK_SIZE characters long.
 
     See docs in transform_words.
 
     :param json_string: str containing json encoded string
     :return: iterator that returns strings
     '''
+    yield from join_chunks(generate_fragments(decode_json_string(json_string)))
+
+
+def decode_json_string(json_string):
+    '''
+    Validate and decode the input of transform_words.
+
+    :param json_string: str containing json encoded string
+    :return: decoded str
+    '''
     if not isinstance(json_string, str):
-        # although json.loads allows bytes input, restrict input to str
+        # although the json module allows bytes input, restrict input to str
         raise WordTransformException('Input required as str, got a {} instead'.format(type(json_string)))
 
     if len(json_string) < 2 or json_string[0] != '"' or json_string[-1] != '"':
@@ -304,44 +319,105 @@ def transform_words_generator(json_string):
         raise WordTransformException('JSON encoded string must be surrounded by double quotes')
 
     try:
-        decoded_input = json.loads(json_string)
+        # The input can only be a JSON string, so decode it with the string scanner of the json
+        # module directly. json.loads would add the overhead of its generic value parser.
+        decoded_input, end_idx = scanstring(json_string, 1)
     except json.JSONDecodeError as e:
         raise WordTransformException('JSON encoded string required') from e
 
-    if not isinstance(decoded_input, str):
-        raise WordTransformException('JSON encoded string required, got a {} instead'.format(type(decoded_input)))
-
-    pending_tokens = []
-    for token in WordParser(decoded_input).generate_tokens():
-        '''
-        Logic:
-        * Process tokens generated by the WordParser
-        * yield token content as-is until a WORD_FIRST_PART token is encountered
-        * After WORD_FIRST_PART is found, start buffering the tokens in pending_tokens.
-        * When the matching WORD_FIRST_PART is encountered, swap the WORD_FIRST_PART tokens
-          (which are always at the first and last item in buffer)
-        * Repeat until end of input. If tokens remains in buffer, flush it at end. 
-        '''
-        if token.token_type == TokenType.WORD_FIRST_PART:
-            pending_tokens.append(token)
-            if len(pending_tokens) > 1:
-                # we found a matching WORD_FIRST_PART token, so swap the tokens and
-                # yield the buffered token contents
-                assert pending_tokens[0].token_type == TokenType.WORD_FIRST_PART
-                pending_tokens[0], pending_tokens[-1] = pending_tokens[-1], pending_tokens[0]
-                for tok in pending_tokens:
-                    yield tok.string_value
-                pending_tokens = []
-        elif not pending_tokens:
-            # we are not buffering the output while waiting for the next word start, so
-            # yield the output immediately
-            yield token.string_value
+    if end_idx != len(json_string):
+        # for example '"foo" "bar"'
+        raise WordTransformException('JSON encoded string required, got extra data after the string')
+
+    return decoded_input
+
+
+def generate_fragments(decoded_input):
+    '''
+    :param decoded_input: decoded input string
+    :return: iterator that returns the transformed output in fragments of arbitrary length
+    '''
+    if USE_STATE_MACHINE:
+        return transform_tokens(WordParser(decoded_input).generate_tokens())
+    return transform_decoded_string(decoded_input)
+
+
+def join_chunks(fragments, chunk_size=OUTPUT_CHUNK_SIZE):
+    '''
+    Join string fragments into chunks of at least chunk_size characters. The last chunk may be shorter.
+
+    :param fragments: iterable of strings
+    :param chunk_size: minimum length of a chunk
+    :return: iterator that returns strings
+    '''
+    chunk = []
+    chunk_length = 0
+    for fragment in fragments:
+        chunk.append(fragment)
+        chunk_length += len(fragment)
+        if chunk_length >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            chunk_length = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def transform_decoded_string(input_string):
+    '''
+    Swap the word beginnings in a decoded string, scanning the word pairs with WORD_PAIR_RE.
+
+    The output is built from slices of the input string, so no tokens are constructed.
+
+    :param input_string: decoded input string
+    :return: iterator that returns strings
+    '''
+    flushed_idx = 0  # everything before this index in input_string has been output
+    for match in WORD_PAIR_RE.finditer(input_string):
+        if match.group(6) is None:  # a pair of words, not an odd word
+            yield input_string[flushed_idx:match.start()]  # any space before the pair
+            yield swap_word_pair(match)
+            flushed_idx = match.end()
+    # flush any remaining input, such as any odd word or trailing space
+    yield input_string[flushed_idx:]
+
+
+def transform_tokens(tokens):
+    '''
+    Swap the word beginnings in a stream of tokens generated by the WordParser.
+
+    Logic:
+    * yield token content as-is until a WORD_FIRST_PART token is encountered
+    * After WORD_FIRST_PART is found, hold it and the following WORD_SECOND_PART and SPACE tokens,
+      as a pair of words is always WORD_FIRST_PART [WORD_SECOND_PART] SPACE WORD_FIRST_PART.
+    * When the matching WORD_FIRST_PART is encountered, yield the held tokens with the
+      WORD_FIRST_PART values swapped.
+    * Repeat until end of input. If tokens are held at end, flush them as is.
+
+    :param tokens: iterable of (token_type, string_value) tuples
+    :return: iterator that returns strings
+    '''
+    pending_first_part = None  # WORD_FIRST_PART of the first word in a pair
+    pending_second_part = ''
+    pending_space = ''
+    for token_type, string_value in tokens:
+        if pending_first_part is None:
+            if token_type == TOKEN_WORD_FIRST_PART:
+                pending_first_part = string_value
+            else:
+                yield string_value
+        elif token_type == TOKEN_WORD_FIRST_PART:
+            yield string_value + pending_second_part + pending_space + pending_first_part
+            pending_first_part = None
+            pending_second_part = ''
+            pending_space = ''
+        elif token_type == TOKEN_WORD_SECOND_PART:
+            pending_second_part = string_value
         else:
-            # keep in buffer while waiting for next word start
-            pending_tokens.append(token)
-    # flush any remaining tokens, such as any odd word, space or WORD_SECOND_PART.
-    for tok in pending_tokens:
-        yield tok.string_value
+            pending_space = string_value
+    # flush any odd word at the end
+    if pending_first_part is not None:
+        yield pending_first_part + pending_second_part + pending_space
 
 
 if __name__ == "__main__":